@@ -0,0 +1,155 @@
+import math
+
+from typing import NamedTuple
+
+from exceptions import (
+    GeneralException,
+    GeneralExceptionEnum
+)
+
+from gcax_classes import termcolors
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+FULL_SCALE = 32768
+SAMPLES_PER_FRAME = 14
+
+# A normalized file can touch full scale once at its peak, so only runs of
+# this many full scale samples in a row count as clipping.
+CLIP_RUN_LENGTH = 3
+
+# Ratio of the RMS of the sample to sample difference to the RMS of the
+# signal itself. It's about 1.4 for white noise and close to 0 for low
+# frequency content. DSP ADPCM predicts each sample from the previous two,
+# so anything dominated by high frequencies or noise loses a lot of quality.
+ROUGHNESS_WARNING = 1.0
+
+
+class WAVAnalysis(NamedTuple):
+    name: str
+    sample_rate: int
+    sample_count: int
+    trimmed_sample_count: int
+    peak_db: float
+    rms_db: float
+    clipped_count: int
+    roughness: float
+    # filled in by the exporter once the file is encoded
+    adpcm_bytes: int = 0
+    saved_bytes: int = 0
+
+
+def _to_db(level: float) -> float:
+    return 20 * np.log10(level / FULL_SCALE) if level > 0 else float("-inf")
+
+
+def _count_clipped(magnitudes) -> int:
+    full_scale = np.concatenate(
+        ([0], (magnitudes >= FULL_SCALE - 1).astype(np.int8), [0]))
+    # alternating starts and ends of every run of full scale samples
+    edges = np.flatnonzero(np.diff(full_scale))
+    run_lengths = edges[1::2] - edges[::2]
+    return int(run_lengths[run_lengths >= CLIP_RUN_LENGTH].sum())
+
+
+def print_warnings(analysis: WAVAnalysis):
+    if analysis.clipped_count:
+        print(
+            f"{termcolors.WARNING}WARNING: File '{analysis.name}' has "
+            f"{analysis.clipped_count} clipped samples!{termcolors.ENDC}")
+    if analysis.roughness > ROUGHNESS_WARNING:
+        print(
+            f"{termcolors.WARNING}WARNING: File '{analysis.name}' is mostly noise or "
+            f"high frequencies and will likely compress poorly.{termcolors.ENDC}")
+
+
+class WAVAnalyzer:
+    """Measures levels of WAV data before encoding, and optionally trims silence.
+
+    The analyzer only holds settings, so one instance can be shared between
+    banks that are exported at the same time.
+    """
+
+    def __init__(self, trim: bool = False, threshold_db: float = -60.0, padding_ms: float = 10.0):
+        if np is None:
+            raise GeneralException(GeneralExceptionEnum.NumPyMissing)
+
+        # NaN compares false against everything, which would silently trim
+        # every sound down to one frame
+        if not (math.isfinite(threshold_db) and math.isfinite(padding_ms)):
+            raise GeneralException(
+                GeneralExceptionEnum.InvalidAnalysisSettings)
+
+        self.trim = trim
+        self.threshold = FULL_SCALE * 10 ** (threshold_db / 20)
+        # negative padding would let the trimmed end come before its start
+        self.padding_ms = max(padding_ms, 0.0)
+
+    def _trim_bounds(self, magnitudes, sample_rate: int):
+        loud = np.flatnonzero(magnitudes > self.threshold)
+        if len(loud) == 0:
+            # keep one frame of silence, the encoder can't handle empty data
+            return 0, min(SAMPLES_PER_FRAME, len(magnitudes))
+
+        padding = int(sample_rate * self.padding_ms / 1000)
+        start = max(int(loud[0]) - padding, 0)
+        end = min(int(loud[-1]) + 1 + padding, len(magnitudes))
+        return start, end
+
+    def process(self, name: str, wav: bytes, sample_rate: int):
+        """Analyzes signed 16-bit PCM data.
+
+        Returns the data, trimmed if enabled, along with its WAVAnalysis.
+        """
+        samples = np.frombuffer(wav, dtype="<i2", count=len(wav) // 2)
+        # widened so that abs(-32768) doesn't overflow
+        magnitudes = np.abs(samples.astype(np.int32))
+
+        start, end = 0, len(samples)
+        if self.trim:
+            start, end = self._trim_bounds(magnitudes, sample_rate)
+
+        peak = int(magnitudes.max()) if len(samples) else 0
+        floats = samples.astype(np.float64)
+        rms = float(np.sqrt(np.mean(floats ** 2))) if len(samples) else 0.0
+        diff_rms = float(np.sqrt(np.mean(np.diff(floats) ** 2))) \
+            if len(samples) > 1 else 0.0
+
+        analysis = WAVAnalysis(
+            name, sample_rate, len(samples), end - start,
+            _to_db(peak), _to_db(rms),
+            _count_clipped(magnitudes),
+            diff_rms / rms if rms > 0 else 0.0)
+
+        return wav[start * 2:end * 2], analysis
+
+    def print_report(self, analyses: list):
+        """Prints levels and the ADPCM bytes saved by trimming for one bank."""
+        name_width = max([len(analysis.name) for analysis in analyses] + [4])
+        total_bytes = 0
+        total_saved = 0
+
+        centered_report_header = " Analysis Report ".center(40, '-')
+        print(f"{termcolors.HEADER}{centered_report_header}{termcolors.ENDC}")
+        print(termcolors.OKCYAN)
+
+        print(f"{'File':<{name_width}}  {'Peak':>8}  {'RMS':>8}  {'Clipped':>7}  "
+              f"{'ADPCM':>9}  {'Saved':>9}")
+        for analysis in analyses:
+            total_bytes += analysis.adpcm_bytes
+            total_saved += analysis.saved_bytes
+
+            print(f"{analysis.name:<{name_width}}  {analysis.peak_db:>5.1f} dB  "
+                  f"{analysis.rms_db:>5.1f} dB  {analysis.clipped_count:>7}  "
+                  f"{analysis.adpcm_bytes:>9}  {analysis.saved_bytes:>9}")
+
+        print()
+        print(f"Total ADPCM Size: {hex(total_bytes)} ({total_bytes} bytes)")
+        if self.trim:
+            print(f"Saved By Trimming: {hex(total_saved)} ({total_saved} bytes)")
+
+        print(termcolors.ENDC)
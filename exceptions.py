@@ -18,6 +18,10 @@ class GeneralExceptionEnum(Enum):
     NoFiles = 5,
     NonFile = 6,
     OutputIsFile = 7,
+    StdoutNotSupported = 8,
+    NumPyMissing = 9,
+    NoBanks = 10,
+    InvalidAnalysisSettings = 11,
 
 
 class GeneralException(Exception):
@@ -31,7 +35,11 @@ class GeneralException(Exception):
                                                      "Did you specify the order of them in the filename?"),
         GeneralExceptionEnum.NoFiles: "The given input folder has no .wav files in it.",
         GeneralExceptionEnum.NonFile: "Input path is not a file.",
-        GeneralExceptionEnum.OutputIsFile: "Output path is an already existing file."
+        GeneralExceptionEnum.OutputIsFile: "Output path is an already existing file.",
+        GeneralExceptionEnum.StdoutNotSupported: "This output format can't be streamed to stdout.",
+        GeneralExceptionEnum.NumPyMissing: "NumPy is required for analyzing and trimming WAV files. Install it with 'pip install numpy'.",
+        GeneralExceptionEnum.NoBanks: "No DTPK files were found in the given paths.",
+        GeneralExceptionEnum.InvalidAnalysisSettings: "The silence threshold and trim padding have to be finite numbers."
     }
 
     def __init__(self, exception_enum):
@@ -1,3 +1,5 @@
+import os
+import secrets
 import struct
 import pathlib
 
@@ -15,6 +17,8 @@ from exceptions import (
     WAVExceptionEnum
 )
 
+from analysis import print_warnings
+
 from gcax_classes import (
     ADPCMINFO,
     FileEntry,
@@ -33,10 +37,11 @@ class GCAXExporter:
     file_identifier: int
     output: pathlib.Path
 
-    def __init__(self, dsptool, input: str, file_identifier: str, output: str):
+    def __init__(self, dsptool, input: str, file_identifier: str, output: str, analyzer=None):
         self.dsptool = dsptool  # dsptool.dll
         self.input = pathlib.Path(input)
         self.output = pathlib.Path(output)
+        self.analyzer = analyzer  # optional analysis.WAVAnalyzer
         self._set_file_identifier(file_identifier)
 
         if not self.input.is_dir():
@@ -61,9 +66,7 @@ class GCAXExporter:
 
         self.file_identifier = file_identifier
 
-    def _encode_wav(self, file, data_offset):
-        info = ADPCMINFO()
-
+    def _read_wav(self, file):
         with open(self.input / file.name, 'rb') as wavfile:
             if wavfile.read(4).decode('ASCII') != 'RIFF':
                 raise WAVException(
@@ -102,8 +105,14 @@ class GCAXExporter:
             wavfile.seek(0x28)
             data_length = struct.unpack('<I', wavfile.read(4))[0]
             wav = wavfile.read(data_length)
-            wav_data = [struct.unpack('<h', wav[i:i + 2])[0]
-                        for i in range(0, len(wav), 2)]
+
+        return wav, sample_rate
+
+    def _encode_pcm(self, wav, sample_rate):
+        info = ADPCMINFO()
+
+        wav_data = [struct.unpack('<h', wav[i:i + 2])[0]
+                    for i in range(0, len(wav), 2)]
 
         sample_count = len(wav_data)
         c_sample_count = c_uint32(sample_count)
@@ -117,19 +126,42 @@ class GCAXExporter:
 
         coefs = (c_int16.__ctype_be__ * 16)(*info.coef)
 
-        fileentry = FileEntry(data_offset, 2, (adpcm_byte_count << 1) - 1,
+        # start_offset is filled in once the entry's place in the bank is known
+        fileentry = FileEntry(0, 2, (adpcm_byte_count << 1) - 1,
                               coefs, (0, 0, 0), 0x200,
                               sample_rate, adpcm_byte_count)
 
         return outpcm, fileentry
 
-    def run(self):
-        with open(get_path_in_script_dir("Template.dat"), "rb") as tfile:
-            template_main_body = bytearray(tfile.read(0x278))
-            tfile.seek(0x300)
-            template_data_header = bytearray(tfile.read(0x30))
-            template_data_struct = bytearray(tfile.read(0x40))
+    def _encode_wav(self, file):
+        """Returns (outpcm, fileentry, analysis), analysis being None without an analyzer."""
+        wav, sample_rate = self._read_wav(file)
+
+        analysis = None
+        if self.analyzer is not None:
+            wav, analysis = self.analyzer.process(file.name, wav, sample_rate)
+
+        outpcm, fileentry = self._encode_pcm(wav, sample_rate)
+
+        if analysis is not None:
+            untrimmed_bytes = self.dsptool.getBytesForAdpcmBuffer(
+                c_uint32(analysis.sample_count))
+            analysis = analysis._replace(
+                adpcm_bytes=fileentry.data_size,
+                saved_bytes=untrimmed_bytes - fileentry.data_size)
+
+        return outpcm, fileentry, analysis
+
+    def print_analysis_warnings(self, analysis):
+        if analysis is not None:
+            print_warnings(analysis)
 
+    def print_report(self, encoded):
+        if self.analyzer is not None:
+            self.analyzer.print_report(
+                [analysis for _, _, analysis in encoded])
+
+    def _sorted_files(self):
         # order all the files correctly in directory
         try:
             files = sorted(self.input.glob("*.wav"),
@@ -137,11 +169,20 @@ class GCAXExporter:
         except ValueError:
             raise GeneralException(GeneralExceptionEnum.InvalidFilenameFormat)
 
-        file_count = len(files)
-
-        if file_count == 0:
+        if len(files) == 0:
             raise GeneralException(GeneralExceptionEnum.NoFiles)
 
+        return files
+
+    def _build_bank(self, encoded) -> bytes:
+        """Lays out a whole DTPK file from a list of (outpcm, fileentry) pairs."""
+        with open(get_path_in_script_dir("Template.dat"), "rb") as tfile:
+            template_main_body = bytearray(tfile.read(0x278))
+            tfile.seek(0x300)
+            template_data_header = bytearray(tfile.read(0x30))
+            template_data_struct = bytearray(tfile.read(0x40))
+
+        file_count = len(encoded)
         delta_file_count = file_count - 1
 
         template_main_body += struct.pack('>2HB3x',
@@ -164,14 +205,11 @@ class GCAXExporter:
             audio_info_struct[0x3] = f
             audio_info_data += audio_info_struct
 
-        file_entry_data = struct.pack('>I', delta_file_count)
+        file_entry_data = bytearray(struct.pack('>I', delta_file_count))
         audio_data = bytearray(struct.pack(
             '>8sI20x', bytes('gcaxPCMD', 'ascii'), 0x024a0100))
-        for wavfilename in files:
-            print(
-                f"{termcolors.OKCYAN}Encoding '{wavfilename.name}'{termcolors.ENDC}")
-
-            outpcm, fileentry = self._encode_wav(wavfilename, len(audio_data))
+        for outpcm, fileentry, _ in encoded:
+            fileentry.start_offset = len(audio_data)
 
             file_entry_data += fileentry
             audio_data += outpcm
@@ -180,8 +218,6 @@ class GCAXExporter:
             while len(audio_data) != aligned_length:
                 audio_data += b'\x00'
 
-        print()
-
         aligned_length = align_32bit(len(audio_data))
         while len(audio_data) != aligned_length:
             audio_data += b'\x00'
@@ -212,13 +248,39 @@ class GCAXExporter:
         replace_int_bytearray(
             template_main_body, 0xBC, end_of_info)
 
-        with open(self.output, 'wb') as outfile:
-            outfile.write(template_main_body)
-            outfile.write(audio_info_data)
-            outfile.write(file_entry_data)
-            while outfile.tell() != audio_data_start_offset:
-                outfile.write(b'\x00')
+        bank = template_main_body + audio_info_data + file_entry_data
+        bank += bytes(audio_data_start_offset - len(bank))
+        bank += audio_data
+        bank += bytes(full_file_length - len(bank))
+
+        return bytes(bank)
+
+    def _write_output(self, bank: bytes):
+        # write next to the output and rename over it, so that a game or tool
+        # reading the bank never sees a half-written file
+        temp_path = self.output.with_name(
+            f"{self.output.name}.{secrets.token_hex(4)}.tmp")
+        try:
+            with open(temp_path, 'xb') as outfile:
+                outfile.write(bank)
+            os.replace(temp_path, self.output)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+    def run(self):
+        files = self._sorted_files()
+
+        encoded = []
+        for wavfilename in files:
+            print(
+                f"{termcolors.OKCYAN}Encoding '{wavfilename.name}'{termcolors.ENDC}")
+
+            encoded.append(self._encode_wav(wavfilename))
+            self.print_analysis_warnings(encoded[-1][2])
+
+        print()
+
+        self.print_report(encoded)
 
-            outfile.write(audio_data)
-            while outfile.tell() != full_file_length:
-                outfile.write(b'\x00')
+        self._write_output(self._build_bank(encoded))
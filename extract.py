@@ -1,5 +1,11 @@
+import io
+import json
 import struct
+import sys
 import pathlib
+import tarfile
+import time
+import zipfile
 
 from exceptions import (
     GCAXException,
@@ -23,9 +29,34 @@ from ctypes import (
 )
 
 
+# larger than the default so that archive sinks turn into a handful of big
+# sequential writes instead of one per header field
+WRITE_BUFFER_SIZE = 1 << 20
+
+WAV_HEADER = struct.Struct("<4sI8sIHHIIHH4sI")
+
+
+def build_wav_header(sample_rate: int, audio_data_len: int) -> bytes:
+    """Builds the 0x2C byte header of a signed 16-bit mono PCM wave file."""
+    return WAV_HEADER.pack(
+        b"RIFF",
+        # size of file, not accounting for "RIFF" and the size itself
+        audio_data_len + WAV_HEADER.size - 8,
+        b"WAVEfmt ",
+        0x10,  # size of wav type format
+        1,  # format type
+        1,  # number of channels
+        sample_rate,
+        sample_rate * 2,  # audio data rate
+        2,  # block alignment
+        16,  # bits per sample
+        b"data",
+        audio_data_len)
+
+
 class WAVWriter:
     """Class that handles writing a signed 16-bit PCM wave file."""
-    HEADER_SIZE = 0x2C
+    HEADER_SIZE = WAV_HEADER.size
 
     def __init__(self, path: pathlib.Path):
         self.path = path
@@ -38,41 +69,283 @@ class WAVWriter:
         self.file.close()
 
     def _write_header(self, sample_rate: int, audio_data_len: int):
-        self.file.write(b"RIFF")
+        self.file.write(build_wav_header(sample_rate, audio_data_len))
+
+    def write(self, sample_rate: int, audio_data):
+        self._write_header(sample_rate, len(audio_data))
+        self.file.write(audio_data)
+
 
-        # calc size of file
-        size_of_file = audio_data_len + self.HEADER_SIZE
-        size_of_file -= 8  # to not account for "RIFF" and size of file description
+def sound_filename(index: int) -> str:
+    return f"{index}_Sound.wav"
 
-        self.file.write(struct.pack("<I", size_of_file))
-        self.file.write(b"WAVEfmt ")
 
-        # size of wav type format
-        self.file.write(struct.pack("<I", 0x10))
+class FolderSink:
+    """Writes every sound as its own .wav file in a folder."""
 
-        # format type
-        self.file.write(struct.pack("<H", 1))
+    def __init__(self, output: str):
+        self.output = output
 
-        # number of channels
-        self.file.write(struct.pack("<H", 1))
+    def __enter__(self):
+        # only created once the input has been validated, so that a bad
+        # input doesn't leave an empty folder behind
+        self.folder = prepare_output_folder(self.output)
+        return self
 
-        self.file.write(struct.pack("<I", sample_rate))
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
 
-        # audio data rate
-        self.file.write(struct.pack("<I", sample_rate * 2))
+    def add(self, index: int, sample_rate: int, audio_data: bytes):
+        with WAVWriter(self.folder / sound_filename(index)) as writer:
+            writer.write(sample_rate, audio_data)
 
-        # block alignment
-        self.file.write(struct.pack("<H", 2))
 
-        # bits per sample
-        self.file.write(struct.pack("<H", 16))
+class _SingleFileSink:
+    """Base for sinks that write the whole bank into one output file.
 
-        self.file.write(b"data")
-        self.file.write(struct.pack("<I", audio_data_len))
+    An output of "-" streams to stdout instead.
+    """
 
-    def write(self, sample_rate: int, audio_data):
-        self._write_header(sample_rate, len(audio_data))
+    def __init__(self, output: str):
+        self.to_stdout = output == "-"
+        self.path = None if self.to_stdout else pathlib.Path(output)
+
+        if self.path is not None and self.path.is_dir():
+            raise GeneralException(GeneralExceptionEnum.OutputIsDirectory)
+
+        # bound here so that progress messages can be redirected away from
+        # stdout afterwards
+        self.stdout = sys.stdout.buffer if self.to_stdout else None
+
+    def __enter__(self):
+        if self.to_stdout:
+            self.file = self.stdout
+        else:
+            self.file = open(self.path, "wb", buffering=WRITE_BUFFER_SIZE)
+
+        self._open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # a failed extraction must not be finalized into an output that looks
+        # complete, so skip the archive trailer or index and remove the file
+        failed = exc_type is not None
+        try:
+            if failed:
+                self._abort()
+            else:
+                self._close()
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            if self.to_stdout:
+                self.file.flush()
+            else:
+                self.file.close()
+                if failed:
+                    self.path.unlink(missing_ok=True)
+
+    def _open(self):
+        pass
+
+    def _close(self):
+        pass
+
+    def _abort(self):
+        pass
+
+
+class TarSink(_SingleFileSink):
+    """Writes every sound as a .wav member of one uncompressed tar archive."""
+
+    def _open(self):
+        # stream mode never seeks, so it also works on pipes
+        self.tar = tarfile.open(fileobj=self.file, mode="w|",
+                                bufsize=WRITE_BUFFER_SIZE)
+        self.mtime = int(time.time())
+
+    def _close(self):
+        self.tar.close()
+
+    def _abort(self):
+        # closes only the underlying stream, which flushes what was already
+        # added without writing the end of archive blocks
+        self.tar.fileobj.close()
+        self.tar.closed = True
+
+    def add(self, index: int, sample_rate: int, audio_data: bytes):
+        wav = build_wav_header(sample_rate, len(audio_data)) + audio_data
+
+        member = tarfile.TarInfo(sound_filename(index))
+        member.size = len(wav)
+        member.mtime = self.mtime
+        self.tar.addfile(member, io.BytesIO(wav))
+
+
+class ZipSink(_SingleFileSink):
+    """Writes every sound as a .wav member of one uncompressed zip archive."""
+
+    def _open(self):
+        self.zip = zipfile.ZipFile(self.file, "w", zipfile.ZIP_STORED)
+
+    def _close(self):
+        self.zip.close()
+
+    def _abort(self):
+        # ZipFile has no way to abort, and would otherwise write the central
+        # directory when garbage collected
+        self.zip.fp = None
+
+    def _filename(self, index: int) -> str:
+        return sound_filename(index)
+
+    def _encode(self, sample_rate: int, audio_data: bytes) -> bytes:
+        return build_wav_header(sample_rate, len(audio_data)) + audio_data
+
+    def add(self, index: int, sample_rate: int, audio_data: bytes):
+        self.zip.writestr(self._filename(index),
+                          self._encode(sample_rate, audio_data))
+
+
+def build_npy_header(dtype: str, length: int) -> bytes:
+    """Builds a version 1.0 .npy header for a one dimensional array."""
+    header = f"{{'descr': '{dtype}', 'fortran_order': False, 'shape': ({length},), }}"
+    # magic, version and header length take up 10 bytes, and the whole
+    # header has to end in a newline on a 64 byte boundary
+    padding = -(10 + len(header) + 1) % 64
+    header = header + " " * padding + "\n"
+
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("ascii")
+
+
+class NpzSink(ZipSink):
+    """Writes every sound as an int16 array in an .npz archive.
+
+    The archive can be opened with numpy.load, the arrays are named
+    "0_Sound", "1_Sound" and so on, and "sample_rates" holds each sound's
+    sample rate.
+    """
+
+    def _open(self):
+        super()._open()
+        self.sample_rates = []
+
+    def _close(self):
+        self.zip.writestr("sample_rates.npy", build_npy_header(
+            "<u4", len(self.sample_rates)) + struct.pack(
+            f"<{len(self.sample_rates)}I", *self.sample_rates))
+        super()._close()
+
+    def _filename(self, index: int) -> str:
+        return f"{index}_Sound.npy"
+
+    def _encode(self, sample_rate: int, audio_data: bytes) -> bytes:
+        self.sample_rates.append(sample_rate)
+        return build_npy_header("<i2", len(audio_data) // 2) + audio_data
+
+
+class RawSink(_SingleFileSink):
+    """Writes all sounds back to back as one raw signed 16-bit PCM blob.
+
+    A JSON index with each sound's byte offset, size and sample rate is
+    written next to it, at the output path with ".json" appended.
+    """
+
+    def __init__(self, output: str):
+        if output == "-":
+            raise GeneralException(GeneralExceptionEnum.StdoutNotSupported)
+
+        super().__init__(output)
+        self.index_path = self.path.with_name(self.path.name + ".json")
+
+    def _open(self):
+        self.entries = []
+        self.offset = 0
+
+    def _close(self):
+        index = {
+            "sample_format": "s16le",
+            "channels": 1,
+            "sounds": self.entries
+        }
+        with open(self.index_path, "w") as index_file:
+            json.dump(index, index_file, indent=2)
+
+    def add(self, index: int, sample_rate: int, audio_data: bytes):
+        self.entries.append({
+            "name": sound_filename(index),
+            "offset": self.offset,
+            "size": len(audio_data),
+            "sample_rate": sample_rate
+        })
         self.file.write(audio_data)
+        self.offset += len(audio_data)
+
+
+SINKS = {
+    "folder": FolderSink,
+    "tar": TarSink,
+    "zip": ZipSink,
+    "npz": NpzSink,
+    "raw": RawSink
+}
+
+
+def sink_for_output(output: str, format: str = None):
+    """Picks a sink from `format`, or from the output's extension if None."""
+    if format is None:
+        suffix = pathlib.Path(output).suffix.lower()
+        if output == "-":
+            format = "tar"
+        elif suffix in (".tar", ".zip", ".npz"):
+            format = suffix[1:]
+        elif suffix in (".pcm", ".raw"):
+            format = "raw"
+        else:
+            format = "folder"
+
+    if format == "folder" and output == "-":
+        raise GeneralException(GeneralExceptionEnum.StdoutNotSupported)
+
+    return SINKS[format](output)
+
+
+def decode_adpcm(dsptool, file_entry: FileEntry, adpcm_data: bytes) -> bytes:
+    """Decodes one entry's ADPCM data to signed 16-bit PCM."""
+    # calculate sample count
+    SAMPLES_PER_FRAME = 14
+    BYTES_PER_FRAME = 8
+    frame_count = file_entry.data_size // BYTES_PER_FRAME
+    sample_count = frame_count * SAMPLES_PER_FRAME
+
+    # setup info coefs
+    info = ADPCMINFO()
+    info.coef = (c_int16 * 16)(*file_entry.coef)
+
+    # setup buffers
+    pcm_buf_size = dsptool.getBytesForPcmBuffer(
+        c_uint32(sample_count))
+    out_pcm_buf = (c_int16 * (pcm_buf_size // 2))()
+
+    in_adpcm_buf = (c_uint8 * file_entry.data_size)(*adpcm_data)
+
+    # decode
+    dsptool.decode(byref(in_adpcm_buf), byref(
+        out_pcm_buf), byref(info), c_uint32(sample_count))
+
+    return bytes(out_pcm_buf)
+
+
+def prepare_output_folder(folder: str) -> pathlib.Path:
+    # make output folder if necessary
+    folder = pathlib.Path(folder)
+
+    if folder.exists() and folder.is_file():
+        raise GeneralException(GeneralExceptionEnum.OutputIsFile)
+
+    folder.mkdir(exist_ok=True)
+    return folder
 
 
 class GCAXExtracter:
@@ -100,40 +373,7 @@ class GCAXExtracter:
     def _read_u32(self):
         return struct.unpack(">I", self.file.read(4))[0]
 
-    def _extract_adpcm(self):
-        file_entry = FileEntry.from_buffer_copy(
-            self.file.read(sizeof(FileEntry)))
-        last_offset = self.file.tell()
-
-        self.file.seek(self.audio_data_offset + file_entry.start_offset)
-        adpcm_data = self.file.read(file_entry.data_size)
-
-        # calculate sample count
-        SAMPLES_PER_FRAME = 14
-        BYTES_PER_FRAME = 8
-        frame_count = file_entry.data_size // BYTES_PER_FRAME
-        sample_count = frame_count * SAMPLES_PER_FRAME
-
-        # setup info coefs
-        info = ADPCMINFO()
-        info.coef = (c_int16 * 16)(*file_entry.coef)
-
-        # setup buffers
-        pcm_buf_size = self.dsptool.getBytesForPcmBuffer(
-            c_uint32(sample_count))
-        out_pcm_buf = (c_int16 * (pcm_buf_size // 2))()
-
-        in_adpcm_buf = (c_uint8 * file_entry.data_size)(*adpcm_data)
-
-        # decode
-        self.dsptool.decode(byref(in_adpcm_buf), byref(
-            out_pcm_buf), byref(info), c_uint32(sample_count))
-
-        self.file.seek(last_offset)
-
-        return bytes(out_pcm_buf), file_entry.sample_rate
-
-    def extract_to_folder(self, folder: str):
+    def _read_file_entries(self) -> list:
         # read necessary info from dtpk file
         self.file.seek(0x1C)
         self.audio_data_offset = self._read_u32()
@@ -141,23 +381,37 @@ class GCAXExtracter:
         self.file.seek(0xB8)
         self.file_entries_offset = self._read_u32()
 
-        # make output folder if necessary
-        folder = pathlib.Path(folder)
+        self.file.seek(self.file_entries_offset)
+        audio_file_count = self._read_u32() + 1
 
-        if folder.exists() and folder.is_file():
-            raise GeneralException(GeneralExceptionEnum.OutputIsFile)
+        return [FileEntry.from_buffer_copy(self.file.read(sizeof(FileEntry)))
+                for _ in range(audio_file_count)]
 
-        folder.mkdir(exist_ok=True)
+    def _read_adpcm(self, file_entry: FileEntry) -> bytes:
+        self.file.seek(self.audio_data_offset + file_entry.start_offset)
+        return self.file.read(file_entry.data_size)
 
-        self.file.seek(self.file_entries_offset)
-        audio_file_count = self._read_u32() + 1
+    def iter_sounds(self):
+        """Yields (audio_data, sample_rate) for every entry, in bank order."""
+        for file_entry in self._read_file_entries():
+            audio_data = decode_adpcm(
+                self.dsptool, file_entry, self._read_adpcm(file_entry))
+            yield audio_data, file_entry.sample_rate
+
+    def extract_to_folder(self, folder: str):
+        self.extract_to(FolderSink(folder))
+
+    def extract_to(self, sink):
+        """Decodes every entry into the given sink (see SINKS)."""
+        file_entries = self._read_file_entries()
 
-        print(f"{termcolors.OKCYAN}Found {audio_file_count} audio files.")
+        print(f"{termcolors.OKCYAN}Found {len(file_entries)} audio files.")
         print(f"Extracting...{termcolors.ENDC}")
         print()
 
         # extract audio files
-        for i in range(audio_file_count):
-            audio_data, sample_rate = self._extract_adpcm()
-            with WAVWriter(folder / f"{i}_Sound.wav") as writer:
-                writer.write(sample_rate, audio_data)
+        with sink:
+            for i, file_entry in enumerate(file_entries):
+                audio_data = decode_adpcm(
+                    self.dsptool, file_entry, self._read_adpcm(file_entry))
+                sink.add(i, file_entry.sample_rate, audio_data)
@@ -0,0 +1,184 @@
+import asyncio
+import functools
+import os
+import threading
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from export import GCAXExporter
+from extract import (
+    GCAXExtracter,
+    FolderSink,
+    decode_adpcm
+)
+from parser import GCAXParser, DTPKInfo
+
+
+# All coroutines in this module share one executor, so the number of threads
+# doing codec calls and file I/O stays bounded however many requests are in
+# flight at once.
+DEFAULT_MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+_executor = None
+_executor_lock = threading.Lock()
+_max_workers = DEFAULT_MAX_WORKERS
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_max_workers,
+                                           thread_name_prefix="gcax")
+        return _executor
+
+
+def configure_executor(max_workers: int):
+    """Replaces the shared executor with one capped at `max_workers` threads."""
+    global _executor, _max_workers
+    with _executor_lock:
+        old_executor = _executor
+        _max_workers = max_workers
+        _executor = ThreadPoolExecutor(max_workers=max_workers,
+                                       thread_name_prefix="gcax")
+
+    if old_executor is not None:
+        old_executor.shutdown(wait=False)
+
+
+def shutdown_executor(wait: bool = True):
+    global _executor
+    with _executor_lock:
+        old_executor = _executor
+        _executor = None
+
+    if old_executor is not None:
+        old_executor.shutdown(wait=wait)
+
+
+def _submit(func, *args) -> asyncio.Future:
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(get_executor(), functools.partial(func, *args))
+
+
+async def _gather(futures: list) -> list:
+    # asyncio.gather leaves the other jobs running if one fails, so cancel
+    # whatever hasn't started yet before propagating
+    try:
+        return await asyncio.gather(*futures)
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+
+async def export_async(dsptool, input: str, file_identifier: str, output: str, analyzer=None):
+    """Async counterpart of `GCAXExporter.run`.
+
+    Every WAV file is encoded as a separate job on the shared executor. The
+    output file is only written once all of them have finished, so cancelling
+    the coroutine never leaves a half-written bank behind.
+
+    With an analyzer, returns this bank's list of WAVAnalysis in bank order
+    instead of printing a report.
+    """
+    exporter = await _submit(GCAXExporter, dsptool, input,
+                             file_identifier, output, analyzer)
+    files = await _submit(exporter._sorted_files)
+    encoded = await _gather([_submit(exporter._encode_wav, wavfilename)
+                             for wavfilename in files])
+
+    bank = await _submit(exporter._build_bank, encoded)
+    await _submit(exporter._write_output, bank)
+
+    if analyzer is not None:
+        return [analysis for _, _, analysis in encoded]
+
+
+def _read_bank(extracter: GCAXExtracter):
+    with extracter:
+        file_entries = extracter._read_file_entries()
+        extracter.file.seek(0)
+        return extracter.file.read(), file_entries, extracter.audio_data_offset
+
+
+async def _open_bank(dsptool, input_path: str):
+    extracter = await _submit(GCAXExtracter, dsptool, input_path)
+    bank, file_entries, audio_data_offset = await _submit(
+        _read_bank, extracter)
+    return memoryview(bank), file_entries, audio_data_offset
+
+
+async def _decode_bank(dsptool, bank, file_entries, audio_data_offset, prefetch):
+    def decode_next(file_entry):
+        start = audio_data_offset + file_entry.start_offset
+        adpcm_data = bank[start:start + file_entry.data_size]
+        return file_entry, _submit(decode_adpcm, dsptool, file_entry, adpcm_data)
+
+    file_entries = iter(file_entries)
+    pending = deque()
+    try:
+        for file_entry in file_entries:
+            pending.append(decode_next(file_entry))
+            if len(pending) >= max(prefetch, 1):
+                break
+
+        while pending:
+            file_entry, future = pending.popleft()
+            audio_data = await future
+
+            next_entry = next(file_entries, None)
+            if next_entry is not None:
+                pending.append(decode_next(next_entry))
+
+            yield audio_data, file_entry.sample_rate
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+async def iter_sounds_async(dsptool, input_path: str, prefetch: int = None):
+    """Async counterpart of `GCAXExtracter.iter_sounds`.
+
+    Yields (audio_data, sample_rate) for every entry, in bank order. Up to
+    `prefetch` entries (the executor size by default) are decoded ahead of
+    the consumer.
+    """
+    if prefetch is None:
+        prefetch = _max_workers
+
+    bank, file_entries, audio_data_offset = await _open_bank(dsptool, input_path)
+    async for sound in _decode_bank(dsptool, bank, file_entries,
+                                    audio_data_offset, prefetch):
+        yield sound
+
+
+async def extract_async(dsptool, input_path: str, folder: str):
+    """Async counterpart of `GCAXExtracter.extract_to_folder`."""
+    # the bank is validated before the folder is created, like the sync path
+    bank, file_entries, audio_data_offset = await _open_bank(dsptool, input_path)
+
+    sink = FolderSink(folder)
+    await _submit(sink.__enter__)
+    try:
+        sounds = _decode_bank(dsptool, bank, file_entries,
+                              audio_data_offset, _max_workers)
+        i = 0
+        async for audio_data, sample_rate in sounds:
+            await _submit(sink.add, i, sample_rate, audio_data)
+            i += 1
+    except BaseException as exc:
+        sink.__exit__(type(exc), exc, exc.__traceback__)
+        raise
+    sink.__exit__(None, None, None)
+
+
+def _parse(input_path: str) -> DTPKInfo:
+    with GCAXParser(input_path) as gcax_parser:
+        return gcax_parser.parse()
+
+
+async def info_async(input_path: str) -> DTPKInfo:
+    """Async counterpart of `GCAXParser.parse`."""
+    return await _submit(_parse, input_path)
@@ -1,17 +1,24 @@
 import argparse
+import contextlib
+import math
+import sys
 import gcax_classes
 
 from gcax_classes import termcolors
 
 from exceptions import (
     GeneralException,
+    GeneralExceptionEnum,
     WAVException,
     GCAXException
 )
 
 from export import GCAXExporter
-from extract import GCAXExtracter
+from extract import GCAXExtracter, SINKS, sink_for_output
 from parser import GCAXParser
+from verify import find_banks, verify_banks
+from analysis import WAVAnalyzer
+from watch import GCAXWatcher, DEFAULT_INTERVAL, DEFAULT_DEBOUNCE
 from ctypes import cdll
 
 
@@ -27,11 +34,55 @@ def init_dll(parser: argparse.ArgumentParser):
             3, f"{termcolors.FAIL}\nError: Something went wrong loading dsptool.dll. The file is most likely incompatible with your system.\n{termcolors.ENDC}")
 
 
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def non_negative_int(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"can't be negative, got {value}")
+    return number
+
+
+def positive_float(value: str) -> float:
+    number = float(value)
+    if not math.isfinite(number):
+        raise argparse.ArgumentTypeError(f"must be a finite number, got {value}")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+
+def non_negative_float(value: str) -> float:
+    number = float(value)
+    if not math.isfinite(number):
+        raise argparse.ArgumentTypeError(f"must be a finite number, got {value}")
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"can't be negative, got {value}")
+    return number
+
+
+def non_positive_float(value: str) -> float:
+    number = float(value)
+    if not math.isfinite(number):
+        raise argparse.ArgumentTypeError(f"must be a finite number, got {value}")
+    if number > 0:
+        raise argparse.ArgumentTypeError(f"can't be greater than 0, got {value}")
+    return number
+
+
 def format_exception_error(cls_name: str, exc: Exception) -> str:
     return f"{termcolors.FAIL}{cls_name} Error:\n\t{exc.message}\n\n{termcolors.ENDC}"
 
 
 def export(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    if not args.watch and (args.interval is not None or args.debounce is not None):
+        parser.error("--interval and --debounce can only be used with --watch")
+
     input = args.input
     output = args.output
     if output is None:
@@ -43,7 +94,25 @@ def export(parser: argparse.ArgumentParser, args: argparse.Namespace):
     try:
         print()
 
-        exporter = GCAXExporter(dsptool, input, file_identifier, output)
+        analyzer = None
+        if args.analyze or args.trim_silence:
+            analyzer = WAVAnalyzer(
+                args.trim_silence, args.threshold, args.trim_padding)
+
+        exporter = GCAXExporter(dsptool, input, file_identifier, output, analyzer)
+
+        if args.watch:
+            print(f"{termcolors.OKCYAN}Watching '{input}' for changes. "
+                  f"Press Ctrl+C to stop.{termcolors.ENDC}")
+            print()
+
+            try:
+                GCAXWatcher(exporter, args.interval or DEFAULT_INTERVAL,
+                            args.debounce or DEFAULT_DEBOUNCE).run()
+            except KeyboardInterrupt:
+                print()
+            return
+
         exporter.run()
 
         print(f"{termcolors.OKGREEN}Exporter Message:")
@@ -61,17 +130,23 @@ def extract(parser: argparse.ArgumentParser, args: argparse.Namespace):
     output_path = args.output
     dsptool = init_dll(parser)
 
+    # keep stdout clean for the archive when streaming it
+    messages = sys.stderr if output_path == "-" else sys.stdout
+
     try:
-        print()
+        sink = sink_for_output(output_path, args.format)
 
-        with GCAXExtracter(dsptool, input_path) as extracter:
-            extracter.extract_to_folder(output_path)
+        with contextlib.redirect_stdout(messages):
+            print()
 
-        print(f"{termcolors.OKGREEN}Extracter Message:")
-        print(
-            f"\tSuccessfully extracted audio files to {output_path}{termcolors.ENDC}")
+            with GCAXExtracter(dsptool, input_path) as extracter:
+                extracter.extract_to(sink)
 
-        print()
+            print(f"{termcolors.OKGREEN}Extracter Message:")
+            print(
+                f"\tSuccessfully extracted audio files to {output_path}{termcolors.ENDC}")
+
+            print()
     except GeneralException as exc:
         parser.exit(1, format_exception_error("Extracter", exc))
     except GCAXException as exc:
@@ -94,6 +169,46 @@ def info_function(parser: argparse.ArgumentParser, args: argparse.Namespace):
         parser.exit(2, format_exception_error("Parser", exc))
 
 
+def verify(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    dsptool = init_dll(parser) if args.decode > 0 else None
+    banks = find_banks(args.input)
+
+    # an empty scan is most likely a mistyped path, so don't report success
+    if not banks:
+        parser.exit(1, format_exception_error(
+            "Verifier", GeneralException(GeneralExceptionEnum.NoBanks)))
+
+    print()
+
+    failed_count = 0
+    for path, problems, warnings in verify_banks(banks, dsptool, args.decode, args.jobs):
+        if problems:
+            failed_count += 1
+            print(f"{termcolors.FAIL}FAIL\t{path}")
+            for problem in problems:
+                print(f"\t{problem}")
+            print(termcolors.ENDC, end='')
+        else:
+            print(f"{termcolors.OKGREEN}OK\t{path}{termcolors.ENDC}")
+
+        # not failures, stock game banks don't always match the exporter's layout
+        if warnings:
+            print(termcolors.WARNING, end='')
+            for warning in warnings:
+                print(f"\tWARNING: {warning}")
+            print(termcolors.ENDC, end='')
+
+    print()
+
+    if failed_count:
+        parser.exit(
+            1, f"{termcolors.FAIL}Verifier Message:\n\t{failed_count} of {len(banks)} DTPK files failed verification.\n\n{termcolors.ENDC}")
+
+    print(f"{termcolors.OKGREEN}Verifier Message:")
+    print(f"\tAll {len(banks)} DTPK files passed verification.{termcolors.ENDC}")
+    print()
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="A tool used for working with DTPK soundbanks (a proprietary file format) for the GameCube version of Sonic Riders. These soundbank files commonly have a .DAT file extension. This tool can export, extract and view information on these files.")
@@ -109,6 +224,20 @@ def main():
                                help="Used as a unique identifier to determine what file is which in terms of other DTPK archives loaded in the game. For example, calling audio with the ID 0xA9320200, means that the identifier in this case is 0xA932. You can find a specific DTPK archive's file identifier by using the info subcommand.")
     export_parser.add_argument('output', type=str, nargs='?',
                                help='Path to where the file should be saved, along with the filename. Optional.')
+    export_parser.add_argument('--watch', action='store_true',
+                               help='Keep running and rebuild the DTPK file whenever a WAV file in the input folder is added, changed or removed. Only the affected WAV files are encoded again.')
+    export_parser.add_argument('--interval', type=positive_float, default=None,
+                               help='How often to check the input folder for changes, in seconds. Only valid with --watch. Defaults to 0.5.')
+    export_parser.add_argument('--debounce', type=positive_float, default=None,
+                               help='How long the input folder has to stay unchanged before rebuilding, in seconds. Only valid with --watch. Defaults to 0.5.')
+    export_parser.add_argument('--analyze', action='store_true',
+                               help='Measure the peak and RMS levels and clipping of every WAV file before encoding, warn about files that will likely compress poorly, and print a report of how many bytes of ADPCM data each file takes up. Requires NumPy.')
+    export_parser.add_argument('--trim-silence', action='store_true',
+                               help='Cut off leading and trailing silence from every WAV file before encoding. Also prints the --analyze report, including how many bytes trimming saved for each file. Requires NumPy.')
+    export_parser.add_argument('--threshold', type=non_positive_float, default=-60.0,
+                               help='Level in dBFS below which audio counts as silence for --trim-silence. Can\'t be greater than 0. Defaults to -60.')
+    export_parser.add_argument('--trim-padding', type=non_negative_float, default=10.0,
+                               help='How much audio to keep before the first and after the last sample above the threshold for --trim-silence, in milliseconds. Defaults to 10.')
     export_parser.set_defaults(func=export)
 
     # Subparser for parsing arguments for extracting audio from a DAT file
@@ -117,7 +246,10 @@ def main():
     extract_parser.add_argument(
         'input', type=str, help='Path to the DTPK file to extract audio files from.')
     extract_parser.add_argument(
-        'output', type=str, help="Path to the folder to save all the extracted audio files to. If the folder doesn't exist, it will be created.")
+        'output', type=str, help="Path to the folder to save all the extracted audio files to. If the folder doesn't exist, it will be created. With --format, this is the path to the single output file instead, or - to stream a tar archive to stdout.")
+    extract_parser.add_argument(
+        '--format', type=str, choices=SINKS.keys(), default=None,
+        help="How to store the extracted audio files. folder writes one .wav file per sound. tar and zip write all .wav files into one uncompressed archive. npz writes one int16 array per sound that can be loaded with numpy. raw writes all the PCM data into one file, along with a JSON index next to it that lists each sound's offset, size and sample rate. If not given, it's picked from the output's extension (.tar, .zip, .npz, .pcm/.raw, or - for tar), falling back to folder.")
     extract_parser.set_defaults(func=extract)
 
     # Subparser for parsing arguments for getting information from a DAT file
@@ -127,6 +259,19 @@ def main():
         'input', type=str, help='Path to the DTPK file to print out information about.')
     info_parser.set_defaults(func=info_function)
 
+    # Subparser for parsing arguments for verifying DAT files
+    verify_parser = subparsers.add_parser(
+        "verify", help="Check the structure of one or more DTPK files for corruption")
+    verify_parser.add_argument(
+        'input', type=str, nargs='+', help='Paths to the DTPK files to verify. Folders are searched recursively for DTPK files.')
+    verify_parser.add_argument(
+        '--decode', type=non_negative_int, default=0, metavar='COUNT',
+        help="Also decode up to this many audio files spread over each DTPK file, to check that they decode. Requires dsptool.dll. Off by default.")
+    verify_parser.add_argument(
+        '--jobs', type=positive_int, default=None,
+        help="How many DTPK files to verify in parallel. Defaults to a number based on the CPU count.")
+    verify_parser.set_defaults(func=verify)
+
     parsedargs = parser.parse_args()
     parsedargs.func(parser, parsedargs)
 
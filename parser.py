@@ -1,6 +1,8 @@
 import pathlib
 import struct
 
+from typing import NamedTuple
+
 from exceptions import (
     GeneralException,
     GeneralExceptionEnum,
@@ -10,6 +12,15 @@ from exceptions import (
 from gcax_classes import validate_gcaxdtpk, termcolors
 
 
+class DTPKInfo(NamedTuple):
+    file_identifier: int
+    audio_file_count: int
+    full_file_size: int
+    file_entries_offset: int
+    audio_data_offset: int
+    audio_data_size: int
+
+
 class GCAXParser:
     def __init__(self, input_path: str):
         self.input_path = pathlib.Path(input_path)
@@ -34,10 +45,7 @@ class GCAXParser:
     def _read_u16(self):
         return struct.unpack(">H", self.file.read(2))[0]
 
-    def parse_and_print(self):
-        def hex_upper(num):
-            return "0x" + hex(num)[2:].upper()
-
+    def parse(self) -> DTPKInfo:
         self.file.seek(0xC)
         full_file_size = self._read_u32()
 
@@ -57,6 +65,15 @@ class GCAXParser:
         self.file.seek(0xC, 1)  # relative
         audio_data_size = self._read_u32()
 
+        return DTPKInfo(file_identifier, audio_file_count, full_file_size,
+                        file_entries_offset, audio_data_offset, audio_data_size)
+
+    def parse_and_print(self):
+        def hex_upper(num):
+            return "0x" + hex(num)[2:].upper()
+
+        info = self.parse()
+
         centered_info_header = " General Info ".center(40, '-')
         centered_details_header = " Technical Details ".center(40, '-')
 
@@ -64,17 +81,17 @@ class GCAXParser:
         print(termcolors.OKCYAN)
 
         print(f"File: {self.input_path.name}")
-        print(f"File Identifier: {hex_upper(file_identifier)}")
-        print(f"Audio File Count: {audio_file_count}")
+        print(f"File Identifier: {hex_upper(info.file_identifier)}")
+        print(f"Audio File Count: {info.audio_file_count}")
 
         print(termcolors.ENDC)
 
         print(f"{termcolors.HEADER}{centered_details_header}{termcolors.ENDC}")
         print(termcolors.OKCYAN)
 
-        print(f"Full File Size: {hex_upper(full_file_size)}")
-        print(f"File Entries Offset: {hex_upper(file_entries_offset)}")
-        print(f"Audio Data Offset: {hex_upper(audio_data_offset)}")
-        print(f"Audio Data Size: {hex_upper(audio_data_size)}")
+        print(f"Full File Size: {hex_upper(info.full_file_size)}")
+        print(f"File Entries Offset: {hex_upper(info.file_entries_offset)}")
+        print(f"Audio Data Offset: {hex_upper(info.audio_data_offset)}")
+        print(f"Audio Data Size: {hex_upper(info.audio_data_size)}")
 
         print(termcolors.ENDC)
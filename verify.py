@@ -0,0 +1,262 @@
+import mmap
+import os
+import pathlib
+import struct
+
+from concurrent.futures import ThreadPoolExecutor
+from ctypes import sizeof
+
+from exceptions import (
+    GeneralException,
+    GeneralExceptionEnum
+)
+
+from extract import decode_adpcm
+from gcax_classes import (
+    validate_gcaxdtpk,
+    FileEntry,
+    align_32bit,
+    align_256bit
+)
+
+
+# enough to hold the main header and the file identifier at 0x278
+MIN_BANK_SIZE = 0x27C
+PCMD_HEADER_SIZE = 0x20
+BYTES_PER_FRAME = 8
+COEF_PAIR_COUNT = 8
+# the info block between the main body and the file entries is a header
+# followed by one struct per sound in banks built by the exporter, which
+# stock game banks don't have to follow
+AUDIO_INFO_HEADER_SIZE = 0x30
+AUDIO_INFO_STRUCT_SIZE = 0x40
+
+
+class GCAXVerifier:
+    """Checks a DTPK file for structural corruption.
+
+    Problems are collected instead of raised, so a single pass reports
+    everything wrong with a bank. Differences from the exact layout the
+    exporter produces are only collected as warnings, since stock game
+    banks don't always follow it.
+    """
+
+    def __init__(self, input_path: str, dsptool=None, decode_count: int = 0):
+        self.input_path = pathlib.Path(input_path)
+        self.dsptool = dsptool
+        self.decode_count = decode_count
+
+        if not self.input_path.is_file():
+            raise GeneralException(GeneralExceptionEnum.NonFile)
+
+    def __enter__(self):
+        self.file = open(self.input_path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+
+        # empty files can't be mapped
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) \
+            if self.size else b""
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.size:
+            self.data.close()
+        self.file.close()
+
+    def _u32(self, offset):
+        return struct.unpack_from(">I", self.data, offset)[0]
+
+    def verify(self) -> list:
+        """Returns the list of problems, and leaves warnings in self.warnings."""
+        problems = []
+        self.warnings = []
+
+        if self.size < MIN_BANK_SIZE:
+            return [f"File is only {self.size} bytes long, too small for a DTPK header."]
+
+        if self.data[:8] != b"gcaxDTPK":
+            return ["Missing gcaxDTPK magic."]
+
+        full_file_length = self._u32(0xC)
+        end_of_info_field = self._u32(0x10)
+        audio_data_size_field = self._u32(0x18)
+        audio_data_offset = self._u32(0x1C)
+        file_entries_offset = self._u32(0xB8)
+        end_of_info = self._u32(0xBC)
+
+        if full_file_length != self.size:
+            problems.append(f"File size at 0x0C is {full_file_length:#x}, "
+                            f"but the file is {self.size:#x} bytes long.")
+        if full_file_length & 0xFF:
+            problems.append(
+                f"File size at 0x0C ({full_file_length:#x}) is not 256 byte aligned.")
+
+        if end_of_info & 0x1F:
+            problems.append(
+                f"End of info at 0xBC ({end_of_info:#x}) is not 32 byte aligned.")
+        if end_of_info_field != end_of_info + 0x20:
+            problems.append(f"Value at 0x10 ({end_of_info_field:#x}) does not "
+                            f"match end of info at 0xBC ({end_of_info:#x}) + 0x20.")
+
+        if audio_data_offset & 0x1F:
+            problems.append(
+                f"Audio data offset at 0x1C ({audio_data_offset:#x}) is not 32 byte aligned.")
+        if audio_data_offset < end_of_info:
+            problems.append(f"Audio data offset at 0x1C ({audio_data_offset:#x}) "
+                            f"overlaps the info block ending at {end_of_info:#x}.")
+
+        if file_entries_offset + 4 > min(end_of_info, self.size):
+            problems.append(f"File entries offset at 0xB8 ({file_entries_offset:#x}) "
+                            "is outside of the info block.")
+            return problems
+
+        entry_count = self._u32(file_entries_offset) + 1
+        file_entries_end = file_entries_offset + 4 + \
+            entry_count * sizeof(FileEntry)
+        if file_entries_end > min(end_of_info, self.size):
+            problems.append(f"{entry_count} file entries at {file_entries_offset:#x} "
+                            "run past the end of the info block.")
+            return problems
+
+        main_body_length = self._u32(0xA8)
+        info_block_length = AUDIO_INFO_HEADER_SIZE + \
+            entry_count * AUDIO_INFO_STRUCT_SIZE
+        if file_entries_offset != main_body_length + info_block_length:
+            self.warnings.append(f"File entries offset at 0xB8 ({file_entries_offset:#x}) does not "
+                            f"match the main body length at 0xA8 ({main_body_length:#x}) "
+                            f"+ the info block length ({info_block_length:#x}).")
+        if end_of_info != align_32bit(file_entries_end):
+            self.warnings.append(f"End of info at 0xBC ({end_of_info:#x}) does not match the "
+                            f"end of the file entries ({file_entries_end:#x}).")
+
+        if audio_data_offset + PCMD_HEADER_SIZE > self.size:
+            problems.append(f"Audio data offset at 0x1C ({audio_data_offset:#x}) "
+                            "is past the end of the file.")
+            return problems
+
+        if self.data[audio_data_offset:audio_data_offset + 8] != b"gcaxPCMD":
+            problems.append(
+                f"Missing gcaxPCMD magic at audio data offset {audio_data_offset:#x}.")
+            return problems
+
+        audio_data_size = self._u32(audio_data_offset + 0xC)
+        if audio_data_size & 0x1F:
+            problems.append(
+                f"gcaxPCMD size ({audio_data_size:#x}) is not 32 byte aligned.")
+        if audio_data_size_field != audio_data_size + 0x20:
+            problems.append(f"Value at 0x18 ({audio_data_size_field:#x}) does not "
+                            f"match the gcaxPCMD size ({audio_data_size:#x}) + 0x20.")
+        if audio_data_offset + audio_data_size > self.size:
+            problems.append(f"gcaxPCMD block ({audio_data_size:#x} bytes at "
+                            f"{audio_data_offset:#x}) runs past the end of the file.")
+            return problems
+
+        expected_file_length = align_256bit(audio_data_offset + audio_data_size)
+        if full_file_length != expected_file_length:
+            self.warnings.append(f"File size at 0x0C ({full_file_length:#x}) does not match the "
+                            f"end of the gcaxPCMD block ({expected_file_length:#x}).")
+
+        file_entries = [
+            FileEntry.from_buffer_copy(self.data, file_entries_offset + 4 + i * sizeof(FileEntry))
+            for i in range(entry_count)]
+
+        valid_entries = []
+        for i, file_entry in enumerate(file_entries):
+            start = file_entry.start_offset
+            end = start + file_entry.data_size
+            entry_problems = []
+
+            if start & 0x7:
+                entry_problems.append(
+                    f"Entry {i}: start offset {start:#x} is not 8 byte aligned.")
+            if start < PCMD_HEADER_SIZE or end > audio_data_size:
+                entry_problems.append(f"Entry {i}: data {start:#x}-{end:#x} is outside "
+                                      f"of the audio block (0x20-{audio_data_size:#x}).")
+            if file_entry.shifted_size != (file_entry.data_size << 1) - 1:
+                entry_problems.append(f"Entry {i}: shifted size {file_entry.shifted_size:#x} "
+                                      f"does not match data size {file_entry.data_size:#x}.")
+
+            problems += entry_problems
+            if not entry_problems:
+                valid_entries.append(file_entry)
+
+        if self.dsptool is not None and self.decode_count > 0:
+            problems += self._decode_sample(valid_entries, audio_data_offset)
+
+        return problems
+
+    def _decode_sample(self, file_entries: list, audio_data_offset: int) -> list:
+        problems = []
+
+        # spread the sample evenly over the bank
+        count = min(self.decode_count, len(file_entries))
+        step = len(file_entries) / count if count else 0
+        for i in range(count):
+            file_entry = file_entries[int(i * step)]
+            start = audio_data_offset + file_entry.start_offset
+            adpcm_data = self.data[start:start + file_entry.data_size]
+
+            # the DLL doesn't report bad data, so check that every frame
+            # header picks one of the entry's coefficient pairs
+            frame_headers = adpcm_data[::BYTES_PER_FRAME]
+            bad_frame_count = sum(
+                1 for header in frame_headers if header >> 4 >= COEF_PAIR_COUNT)
+            if bad_frame_count:
+                problems.append(f"Entry at {file_entry.start_offset:#x}: {bad_frame_count} "
+                                f"of {len(frame_headers)} ADPCM frames have an invalid "
+                                "predictor index.")
+                # decoding would index past the coefficient table
+                continue
+
+            try:
+                decode_adpcm(self.dsptool, file_entry, adpcm_data)
+            except Exception as exc:
+                problems.append(
+                    f"Entry at {file_entry.start_offset:#x} failed to decode: {exc}")
+
+        return problems
+
+
+def _verify_bank(path: pathlib.Path, dsptool, decode_count: int):
+    try:
+        with GCAXVerifier(path, dsptool, decode_count) as verifier:
+            return verifier.verify(), verifier.warnings
+    except GeneralException as exc:
+        return [exc.message], []
+    except OSError as exc:
+        return [str(exc)], []
+
+
+def _is_gcaxdtpk(path: pathlib.Path) -> bool:
+    try:
+        with open(path, "rb") as file:
+            return validate_gcaxdtpk(file)
+    except OSError:
+        return False
+
+
+def find_banks(paths: list) -> list:
+    """Expands folders into every DTPK file under them.
+
+    Files given directly are always kept, so that broken banks are still
+    reported.
+    """
+    banks = []
+    for path in map(pathlib.Path, paths):
+        if path.is_dir():
+            banks += sorted(p for p in path.rglob("*")
+                            if p.is_file() and _is_gcaxdtpk(p))
+        else:
+            banks.append(path)
+
+    return banks
+
+
+def verify_banks(paths: list, dsptool=None, decode_count: int = 0, jobs: int = None):
+    """Verifies many banks in parallel, yielding (path, problems, warnings) in order."""
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(
+            lambda path: _verify_bank(path, dsptool, decode_count), paths)
+        for path, (problems, warnings) in zip(paths, results):
+            yield path, problems, warnings
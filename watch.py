@@ -0,0 +1,142 @@
+import struct
+import time
+
+from exceptions import (
+    GeneralException,
+    WAVException
+)
+
+from export import GCAXExporter
+from gcax_classes import termcolors
+
+
+DEFAULT_INTERVAL = 0.5
+DEFAULT_DEBOUNCE = 0.5
+
+
+class GCAXWatcher:
+    """Keeps a DTPK file up to date with the WAV files in an exporter's input.
+
+    Each file's encoded ADPCM data, FileEntry and analysis are kept in memory,
+    keyed by its modification time and size, so a rebuild only re-encodes
+    files that were added or changed since the last one.
+    """
+
+    def __init__(self, exporter: GCAXExporter, interval: float = DEFAULT_INTERVAL,
+                 debounce: float = DEFAULT_DEBOUNCE):
+        self.exporter = exporter
+        self.interval = interval
+        self.debounce = debounce
+
+        # path -> (stat key, (outpcm, fileentry, analysis))
+        self.cache = {}
+
+        # last error from writing the output, so a retried write that keeps
+        # failing is only reported once
+        self.output_error = None
+
+    def _snapshot(self) -> dict:
+        snapshot = {}
+        for path in self.exporter._sorted_files():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # deleted while listing
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+
+        return snapshot
+
+    def _try_snapshot(self):
+        # errors are returned as their message, so that the same error
+        # compares equal between polls
+        try:
+            return self._snapshot()
+        except GeneralException as exc:
+            return exc.message
+
+    def _wait_until_settled(self, snapshot):
+        # editors often save in several steps, so only rebuild once nothing
+        # has changed for a whole debounce period
+        settled_since = time.monotonic()
+        while time.monotonic() - settled_since < self.debounce:
+            time.sleep(self.interval)
+            new_snapshot = self._try_snapshot()
+            if new_snapshot != snapshot:
+                snapshot = new_snapshot
+                settled_since = time.monotonic()
+
+        return snapshot
+
+    def rebuild(self, snapshot: dict) -> bool:
+        """Returns False if the output couldn't be written and should be retried."""
+        start = time.perf_counter()
+
+        for path in self.cache.keys() - snapshot.keys():
+            print(f"{termcolors.OKCYAN}Removed '{path.name}'{termcolors.ENDC}")
+            del self.cache[path]
+
+        encoded = []
+        encoded_count = 0
+        for path, key in snapshot.items():
+            cached = self.cache.get(path)
+            if cached is None or cached[0] != key:
+                print(
+                    f"{termcolors.OKCYAN}Encoding '{path.name}'{termcolors.ENDC}")
+                self.cache[path] = (key, self.exporter._encode_wav(path))
+                self.exporter.print_analysis_warnings(self.cache[path][1][2])
+                encoded_count += 1
+
+            encoded.append(self.cache[path][1])
+
+        try:
+            self.exporter._write_output(self.exporter._build_bank(encoded))
+        except OSError as exc:
+            # e.g. the game holding the bank open on Windows, nothing to do
+            # with the WAV files, so the write is retried on the next poll
+            if str(exc) != self.output_error:
+                self._report("Output", str(exc), "Retrying...")
+            self.output_error = str(exc)
+            return False
+
+        self.output_error = None
+        self.exporter.print_report(encoded)
+
+        elapsed = time.perf_counter() - start
+        print(f"{termcolors.OKGREEN}Rebuilt {self.exporter.output} in {elapsed:.2f}s "
+              f"({encoded_count} of {len(encoded)} files encoded){termcolors.ENDC}")
+        print()
+
+        return True
+
+    def _report(self, cls_name: str, message: str, next_step: str = "Waiting for changes..."):
+        print(f"{termcolors.FAIL}{cls_name} Error:\n\t{message}{termcolors.ENDC}")
+        print(f"{termcolors.WARNING}{next_step}{termcolors.ENDC}")
+        print()
+
+    def run(self):
+        """Builds the output once, then rebuilds it on every change until interrupted."""
+        built_snapshot = None
+        while True:
+            snapshot = self._try_snapshot()
+            if snapshot != built_snapshot:
+                if built_snapshot is not None:
+                    snapshot = self._wait_until_settled(snapshot)
+
+                # remembered even when the build fails, so a broken file is
+                # reported once instead of on every poll. Only a failed write
+                # of the output forgets it again, so that it's retried.
+                built_snapshot = snapshot
+
+                if isinstance(snapshot, str):
+                    self._report("Exporter", snapshot)
+                else:
+                    try:
+                        if not self.rebuild(snapshot):
+                            built_snapshot = None
+                    except WAVException as exc:
+                        self._report("WAV File", exc.message)
+                    except (OSError, struct.error, UnicodeDecodeError) as exc:
+                        # most likely a file that is still being written
+                        self._report("WAV File", str(exc))
+
+            time.sleep(self.interval)